@@ -8,15 +8,18 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .routers import admin, user
 from . import loggers, db, config
-from .access import create_default_user_if_not_exists
+from .access import create_default_user_if_not_exists, auth
 
 
 @asynccontextmanager
 async def lifespan(application: FastAPI):  # pylint: disable=unused-argument
     """Lifespan of FastAPI application"""
-    await db.global_init(config.DB_USER, config.DB_PASSWORD, config.DB_HOST, config.DB_NAME)
+    await db.global_init(config.DB_USER, config.DB_PASSWORD, config.DB_HOST, config.DB_NAME,
+                         pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+                         pool_timeout=config.DB_POOL_TIMEOUT, pool_recycle=config.DB_POOL_RECYCLE)
     await create_default_user_if_not_exists()
     yield
+    auth.shutdown_pwd_pool()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -1,13 +1,20 @@
 """
 Manage Oauth2
 """
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import timedelta, datetime
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import lambda_stmt
+from sqlalchemy.orm import raiseload
+from fastapi import Depends, HTTPException, status, Form
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
 from ..db import models, session_dep
 from ..config import SECRET_KEY
@@ -18,6 +25,9 @@ TOKEN_LIFETIME = 15  # Minutes
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="admin/token")
+# Hashing is CPU-bound, so it's done in separate processes to not block the event loop
+# (pool is started on first use and shut down with the application)
+PWD_POOL: ProcessPoolExecutor | None = None
 
 CredentialsException = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,6 +50,56 @@ def check_password(password: str, hashed: str) -> bool:
     return pwd_context.verify(password, hashed)
 
 
+def shutdown_pwd_pool():
+    """Shut down processes of the hashing pool"""
+    global PWD_POOL  # pylint: disable=W0603
+    if PWD_POOL is not None:
+        PWD_POOL.shutdown()
+        PWD_POOL = None
+
+
+def _new_pwd_pool() -> ProcessPoolExecutor:
+    # Workers mustn't be forked from the running server with its open sockets and locks
+    return ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn"))
+
+
+async def _run_in_pwd_pool(func, *args):
+    """
+    Run function in the hashing pool, replacing the pool if it's broken (e.g. a worker was killed)
+    """
+    global PWD_POOL  # pylint: disable=W0603
+    loop = asyncio.get_running_loop()
+    if PWD_POOL is None:
+        PWD_POOL = _new_pwd_pool()
+    pool = PWD_POOL
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        if PWD_POOL is pool:  # Not replaced by a concurrent call yet
+            pool.shutdown(wait=False)
+            PWD_POOL = _new_pwd_pool()
+        return await loop.run_in_executor(PWD_POOL, func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """
+    Get hash of the password in the process pool
+    :param password:
+    :return: Hash string
+    """
+    return await _run_in_pwd_pool(get_password_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """
+    Verify if the password matches to the hash in the process pool
+    :param password:
+    :param hashed:
+    :return:
+    """
+    return await _run_in_pwd_pool(check_password, password, hashed)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     """
     Create JWT token
@@ -57,38 +117,77 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     return encoded_jwt
 
 
+def _user_query(username: str):
+    """Statement getting user by username; It's cached by `lambda_stmt`, so it's not rebuilt on every request"""
+    return lambda_stmt(lambda: select(models.User).filter_by(username=username).options(raiseload('*')))
+
+
+async def password_request_form(grant_type: str | None = Form(default=None, pattern="password"),
+                                username: str = Form(),
+                                password: str = Form(),
+                                scope: str = Form(default="")) -> OAuth2PasswordRequestForm:
+    """
+    Dependency collecting form of OAuth2 password flow.
+    `OAuth2PasswordRequestForm` is a class, so being used as dependency directly it's called in threadpool
+    :return: `OAuth2PasswordRequestForm` object
+    """
+    return OAuth2PasswordRequestForm(grant_type=grant_type, username=username, password=password, scope=scope)
+
+
 async def authenticate_user(username: str, password: str, session: AsyncSession) -> bool | User:
     """
     Authenticate user
     :return: `False` if authentication failed, or `User` scheme if authentication passed
     """
     # Get user from DB
-    r = await session.execute(select(models.User).filter_by(username=username))
+    r = await session.execute(_user_query(username))
     user = r.scalar_one_or_none()
     if not user:  # User doesn't exist
         return False
-    if not check_password(password, user.hashed_password):  # Wrong password
+    # Release DB connection while waiting for the hashing pool
+    await session.commit()
+    if not await verify_password(password, user.hashed_password):  # Wrong password
         return False
     return User(username=user.username, id=user.id)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme),
-                           session: AsyncSession = Depends(session_dep)) -> User:
+def _decode_token(token: str) -> TokenData:
     """
-    Dependency checking if the user is authenticated and getting his scheme
-    :return: `User` scheme
+    Decode JWT token
+    :return: `TokenData` scheme
     """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])  # Decode payload
         username: str = payload.get("sub")
         if username is None:
             raise CredentialsException
-        token_data = TokenData(username=username)
+        return TokenData(username=username, uid=payload.get("uid"))
     except JWTError as exc:  # Error while decoding
         raise CredentialsException from exc
+
+
+async def get_current_user_from_jwt(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Lightweight dependency checking if the user is authenticated only by JWT token, without touching DB
+    :return: `User` scheme
+    """
+    token_data = _decode_token(token)
+    if token_data.uid is None:  # Token was issued without user's ID
+        raise CredentialsException
+    return User(username=token_data.username, id=token_data.uid)
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme),
+                           session: AsyncSession = Depends(session_dep)) -> "models.User":
+    """
+    Dependency checking if the user is authenticated and getting him from DB.
+    Result is cached by FastAPI within a request, so the user is loaded once and shares request's session
+    :return: `User` model
+    """
+    token_data = _decode_token(token)
     # Get user from DB
-    r = await session.execute(select(models.User).filter_by(username=token_data.username))
+    r = await session.execute(_user_query(token_data.username))
     user = r.scalar_one_or_none()
     if user is None:  # If there's no such user, throw exception
         raise CredentialsException
-    return User(username=user.username, id=user.id)
+    return user
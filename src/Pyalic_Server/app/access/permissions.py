@@ -69,6 +69,18 @@ class Permissions:
     def can_manage_other_users(self) -> bool:
         return 'manage_other_users' in self._permissions or self.is_superuser()
 
+    def able_get_product(self, owned: bool) -> bool:
+        return (self.can_manage_own_products() and owned) or (self.can_read_other_products() and not owned)
+
+    def able_edit_product(self, owned: bool) -> bool:
+        return (self.can_manage_own_products() and owned) or (self.can_manage_other_products() and not owned)
+
+    def able_delete_product(self, owned: bool) -> bool:
+        return (self.can_manage_own_products() and owned) or (self.can_manage_other_products() and not owned)
+
+    def able_add_product(self) -> bool:
+        return self.can_manage_own_products()
+
 
 class VerifiablePermissions(Permissions):
     """
@@ -79,22 +91,7 @@ class VerifiablePermissions(Permissions):
         super().__init__(u.permissions)
         self._u = u
 
-    def able_get_product(self, p: 'models.Product') -> bool:
-        return (self.can_manage_own_products() and p in self._u.owned_products) or \
-            (self.can_read_other_products() and p not in self._u.owned_products)
-
-    def able_edit_product(self, p: 'models.Product') -> bool:
-        return (self.can_manage_own_products() and p in self._u.owned_products) or \
-            (self.can_manage_other_products() and p not in self._u.owned_products)
-
-    def able_delete_product(self, p: 'models.Product') -> bool:
-        return (self.can_manage_own_products() and p in self._u.owned_products) or \
-            (self.can_manage_other_products() and p not in self._u.owned_products)
-
-    def able_add_product(self) -> bool:
-        return self.can_manage_own_products()
-
-    def able_add_user(self, permissions: str) -> bool:
+    def able_grant(self, permissions: str) -> bool:
         try:
             perm_obj = Permissions(permissions)
         except InvalidPermissionsString:
@@ -102,26 +99,15 @@ class VerifiablePermissions(Permissions):
         for p in perm_obj:
             if p not in self._u.get_permissions() and not self.is_superuser():
                 return False  # If someone tries to abuse his permissions and escalate privileges
-        return self.can_create_users()
-
-    def able_edit_user(self, u: 'models.User', permissions: str | None = None) -> bool:
-        if permissions is not None:
-            try:
-                perm_obj = Permissions(permissions)
-            except InvalidPermissionsString:
-                return False
-            for p in perm_obj:
-                if p not in self._u.get_permissions() and not self.is_superuser():
-                    return False  # If someone tries to abuse his permissions and escalate privileges
-        if u.master != self._u:  # If it's not current users product
-            # Requires permission to manage others products
-            return self.can_manage_other_users()
-        return self.can_manage_own_users()
+        return True
+
+    def able_add_user(self, permissions: str) -> bool:
+        return self.able_grant(permissions) and self.can_create_users()
 
     def able_delete_user(self, u: 'models.User') -> bool:
-        if u == self._u:
+        if u.id == self._u.id:
             return False  # You cannot delete yourself
-        if u.master != self._u:
+        if u.master_id != self._u.id:
             # If you want to delete the user you don't own, required appropriate permission
             return self.can_manage_other_users()
         return self.can_manage_own_users()
@@ -9,6 +9,10 @@ DB_HOST = environ.get('DB_HOST')
 DB_USER = environ.get('DB_USER')
 DB_PASSWORD = environ.get('DB_PASSWORD')
 DB_NAME = environ.get('DB_NAME')
+DB_POOL_SIZE = int(environ.get('DB_POOL_SIZE', default=20))
+DB_MAX_OVERFLOW = int(environ.get('DB_MAX_OVERFLOW', default=20))
+DB_POOL_TIMEOUT = int(environ.get('DB_POOL_TIMEOUT', default=5))
+DB_POOL_RECYCLE = int(environ.get('DB_POOL_RECYCLE', default=1800))
 ACCESS_TOKEN = '123'
 
 REDIS_HOST = environ.get('REDIS_HOST')
@@ -18,6 +22,9 @@ REDIS_DB = environ.get('REDIS_DB')
 
 SESSION_ALIVE_PERIOD = int(environ.get('SESSION_ALIVE_PERIOD', default=4))
 
+LICENSE_CACHE_ENABLED = bool(int(environ.get('LICENSE_CACHE_ENABLED', default=1)))
+LICENSE_CACHE_TTL = int(environ.get('LICENSE_CACHE_TTL', default=60))  # Seconds
+
 SECRET_KEY = environ.get('SECRET_KEY')
 ACCESS_TOKEN_EXPIRE_MINUTES = environ.get('ACCESS_TOKEN_EXPIRE_MINUTES', default=30)
 
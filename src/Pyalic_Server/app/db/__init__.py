@@ -1,12 +1,14 @@
 """
 Actions with Database
 """
+import asyncio
 from typing import AsyncIterator
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine
+from sqlalchemy import text, Connection, Index, UniqueConstraint
+from sqlalchemy.schema import CreateIndex
 
 SqlAlchemyBase = declarative_base()
 
@@ -14,24 +16,58 @@ ENGINE = None
 __FACTORY = None
 
 
-async def global_init(user, password, hostname, db_name):
+async def _ping(engine: AsyncEngine):
+    """Check out a connection of the engine and execute a trivial query with it"""
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+def upgrade_schema(conn: Connection):
+    """
+    Bring existing tables up to date with models; `create_all` doesn't alter tables which already exist
+    :param conn: Sync connection to DB
+    """
+    for table in SqlAlchemyBase.metadata.sorted_tables:
+        for index in table.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+        # Unique constraints are backed by unique indexes; Named as PostgreSQL names them for new tables,
+        # so they're skipped where constraints already exist
+        for constraint in table.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+            name = constraint.name or f"{table.name}_{'_'.join(c.name for c in constraint.columns)}_key"
+            index = Index(name, *constraint.columns, unique=True)
+            table.indexes.discard(index)  # It's attached to the table, but mustn't become part of the model
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+async def global_init(user, password, hostname, db_name, *,  # pylint: disable=too-many-arguments
+                      pool_size: int = 20, max_overflow: int = 20, pool_timeout: int = 5, pool_recycle: int = 1800):
     """
     Globally init ASYNC PostgreSQL DB
     :param user: User of DB
     :param password: Password of DB
     :param hostname: Address of DB
     :param db_name: Name of DB
+    :param pool_size: Quantity of connections kept open in the pool
+    :param max_overflow: Quantity of connections allowed to be opened over `pool_size`
+    :param pool_timeout: Seconds to wait for a free connection before giving up
+    :param pool_recycle: Seconds after which a connection is reopened
     """
     global __FACTORY  # pylint: disable=W0603
     global ENGINE  # pylint: disable=W0603
     if __FACTORY:
         return
     conn_str = f'postgresql+asyncpg://{user}:{password}@{hostname}/{db_name}'
-    ENGINE = create_async_engine(conn_str, echo=False, poolclass=NullPool)
+    ENGINE = create_async_engine(conn_str, echo=False, pool_size=pool_size, max_overflow=max_overflow,
+                                 pool_timeout=pool_timeout, pool_recycle=pool_recycle, pool_pre_ping=True)
     __FACTORY = sessionmaker(bind=ENGINE, class_=AsyncSession, expire_on_commit=False)
     async with ENGINE.begin() as conn:
         # Create all models
         await conn.run_sync(SqlAlchemyBase.metadata.create_all)
+        await conn.run_sync(upgrade_schema)
+    # Warm up the pool, so the first requests don't wait for connections being established
+    await asyncio.gather(*(_ping(ENGINE) for _ in range(pool_size)))
 
 
 async def session_dep() -> AsyncIterator[AsyncSession]:
@@ -1,5 +1,5 @@
 """SQLAlchemy ORM models placed here"""
-from sqlalchemy import Column, BigInteger, Integer, Interval, Text, DateTime, orm, ForeignKey, Table
+from sqlalchemy import Column, BigInteger, Integer, Interval, Text, DateTime, orm, ForeignKey, Table, Index
 
 from . import SqlAlchemyBase
 from ..access.permissions import DEFAULT_PERMISSIONS, VerifiablePermissions, Permissions
@@ -22,7 +22,7 @@ class Signature(SqlAlchemyBase):
     comment = Column(Text, default="", nullable=False)
     activation_date = Column(DateTime, default=None)
 
-    product_id = Column(BigInteger, ForeignKey("products.id"), nullable=False)
+    product_id = Column(BigInteger, ForeignKey("products.id"), nullable=False, index=True)
     product = orm.relationship("Product")
 
     installations = orm.relationship("Installation", back_populates="signature")
@@ -33,7 +33,7 @@ class Product(SqlAlchemyBase):
     __tablename__ = "products"
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    name = Column(Text, nullable=False)
+    name = Column(Text, nullable=False, unique=True)
     sig_install_limit = Column(Integer, default=None)  # Limit installs per signature
     sig_sessions_limit = Column(Integer, default=None)  # Limit sessions per signature
     sig_period = Column(Interval, default=None)  # License period per signature
@@ -54,12 +54,14 @@ class Installation(SqlAlchemyBase):
     signature_id = Column(BigInteger, ForeignKey("signatures.id"), nullable=False)
     signature = orm.relationship("Signature")
 
+    __table_args__ = (Index("ix_installations_signature_id_fingerprint", signature_id, fingerprint),)
+
 
 class User(SqlAlchemyBase):
     """User Model for SQLAlchemy"""
     __tablename__ = "users"
     id = Column(BigInteger, primary_key=True, autoincrement=True)
-    username = Column(Text, nullable=False)
+    username = Column(Text, nullable=False, unique=True)
     hashed_password = Column(Text, nullable=False)
     permissions = Column(Text, default=DEFAULT_PERMISSIONS, nullable=False)
 
@@ -0,0 +1,99 @@
+"""
+Read-through cache of license keys info
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from redis.exceptions import RedisError
+from sqlalchemy.future import select
+from sqlalchemy import lambda_stmt
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import redis
+from .. import config
+from ..db import models
+from ..loggers import logger
+
+
+@dataclass
+class LicenseInfo:  # pylint: disable=missing-class-docstring
+    signature_id: int
+    activation_date: datetime | None
+    additional_content_signature: str
+    additional_content_product: str
+    sig_period: timedelta | None
+    sig_install_limit: int | None
+    sig_sessions_limit: int | None
+
+
+def _cache_key(license_key: str) -> str:
+    return f"lic:sig:{license_key}"
+
+
+def _dumps(info: LicenseInfo) -> str:
+    return json.dumps({
+        "signature_id": info.signature_id,
+        "activation_date": info.activation_date.isoformat() if info.activation_date is not None else None,
+        "additional_content_signature": info.additional_content_signature,
+        "additional_content_product": info.additional_content_product,
+        "sig_period": info.sig_period.total_seconds() if info.sig_period is not None else None,
+        "sig_install_limit": info.sig_install_limit,
+        "sig_sessions_limit": info.sig_sessions_limit
+    })
+
+
+def _loads(s: str | bytes) -> LicenseInfo:
+    d = json.loads(s)
+    if d["activation_date"] is not None:
+        d["activation_date"] = datetime.fromisoformat(d["activation_date"])
+    if d["sig_period"] is not None:
+        d["sig_period"] = timedelta(seconds=d["sig_period"])
+    return LicenseInfo(**d)
+
+
+async def get_license_info(license_key: str, session: AsyncSession) -> LicenseInfo | None:
+    """
+    Get info of license key from cache, or from DB if it's not cached yet
+    :param license_key: License key
+    :param session: AsyncSession of database
+    :return: `LicenseInfo` or `None` if there's no signature with such license key
+    """
+    if config.LICENSE_CACHE_ENABLED:
+        try:
+            cached = await redis.get(_cache_key(license_key))
+        except RedisError as exc:  # Cache is unavailable, so just use DB
+            await logger.warning(f"Failed to get license info from cache: {exc}")
+            cached = None
+        if cached is not None:
+            return _loads(cached)
+    # Get only needed columns of signature and its product from DB (in order of `LicenseInfo` fields);
+    # `lambda_stmt` caches the statement, so it's not rebuilt on every call, only `license_key` is bound
+    r = await session.execute(lambda_stmt(
+        lambda: select(models.Signature.id, models.Signature.activation_date, models.Signature.additional_content,
+                       models.Product.additional_content, models.Product.sig_period,
+                       models.Product.sig_install_limit, models.Product.sig_sessions_limit)
+        .join(models.Product, models.Signature.product_id == models.Product.id)
+        .where(models.Signature.license_key == license_key)))
+    row = r.first()
+    if row is None:
+        return None
+    info = LicenseInfo(*row)
+    if config.LICENSE_CACHE_ENABLED:
+        try:
+            await redis.set(_cache_key(license_key), _dumps(info), ex=config.LICENSE_CACHE_TTL)
+        except RedisError as exc:
+            await logger.warning(f"Failed to cache license info: {exc}")
+    return info
+
+
+async def invalidate_license_info(*license_keys: str):
+    """
+    Remove cached info of license keys; Must be called when signature or its product is changed
+    :param license_keys: License keys
+    """
+    if not config.LICENSE_CACHE_ENABLED or not license_keys:
+        return
+    try:
+        await redis.delete(*(_cache_key(k) for k in license_keys))
+    except RedisError as exc:
+        await logger.warning(f"Failed to invalidate cached license info: {exc}")
@@ -4,12 +4,13 @@ Wrapper to easily use licensing engine
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, update, lambda_stmt
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..db import models
 from . import status
 from .sessions import search_sessions, create_session
+from .cache import LicenseInfo, get_license_info, invalidate_license_info
 
 
 @dataclass
@@ -17,6 +18,30 @@ class CheckLicenseResponse:  # pylint: disable=missing-class-docstring
     success: bool
     error: str = None
     session_id: str = None
+    additional_content_signature: str = None
+    additional_content_product: str = None
+
+
+def _expired(info: LicenseInfo) -> bool:
+    current_period = datetime.utcnow() - info.activation_date if info.activation_date is not None else timedelta(
+        seconds=0)
+    return info.sig_period is not None and info.sig_period < current_period
+
+
+async def _activate(info: LicenseInfo, session: AsyncSession):
+    """
+    Set activation date of signature if it's not activated yet, updating `info` with the actual date
+    (it's `None` if signature doesn't exist anymore)
+    """
+    r = await session.execute(update(models.Signature)
+                              .where(models.Signature.id == info.signature_id,
+                                     models.Signature.activation_date.is_(None))
+                              .values(activation_date=datetime.utcnow())
+                              .returning(models.Signature.activation_date))
+    info.activation_date = r.scalar_one_or_none()
+    if info.activation_date is None:  # Already activated, so get the actual date
+        r = await session.execute(select(models.Signature.activation_date).filter_by(id=info.signature_id))
+        info.activation_date = r.scalar_one_or_none()
 
 
 async def process_check_request(license_key: str, fingerprint: str, session: AsyncSession) -> CheckLicenseResponse:
@@ -27,38 +52,52 @@ async def process_check_request(license_key: str, fingerprint: str, session: Asy
     :param session: AsyncSession of database
     :return: `False` and explanation why access mustn't be granted or 'True` and session ID
     """
-    # Get signature
-    r = await session.execute(select(models.Signature).filter_by(license_key=license_key).options(
-        selectinload(models.Signature.product), selectinload(models.Signature.installations)))
-    sig = r.scalar_one_or_none()
-    if sig is None:
+    # Get license info
+    info = await get_license_info(license_key, session)
+    if info is None:
         return CheckLicenseResponse(success=False, error=status.INVALID_KEY)
     # Check license period
-    current_period = datetime.utcnow() - sig.activation_date if sig.activation_date is not None else timedelta(
-        seconds=0)
-    if sig.product.sig_period is not None and sig.product.sig_period < current_period:
+    if _expired(info):
         return CheckLicenseResponse(success=False, error=status.LICENSE_EXPIRED)
     # Check installation limit
     current_inst = None
-    if sig.product.sig_install_limit is not None:
-        r = await session.execute(select(models.Installation).filter_by(signature_id=sig.id, fingerprint=fingerprint))
+    signature_id = info.signature_id
+    if info.sig_install_limit is not None:
+        # Statements are cached by `lambda_stmt`, so they're not rebuilt on every check
+        r = await session.execute(lambda_stmt(
+            lambda: select(models.Installation).filter_by(signature_id=signature_id, fingerprint=fingerprint)))
         current_inst = r.scalar_one_or_none()
-        if current_inst is None and len(sig.installations) >= sig.product.sig_install_limit:
-            return CheckLicenseResponse(success=False, error=status.INSTALLATIONS_LIMIT)
+        if current_inst is None:
+            r = await session.execute(lambda_stmt(
+                lambda: select(func.count()).select_from(models.Installation)  # pylint: disable=not-callable
+                .filter_by(signature_id=signature_id)))
+            if r.scalar() >= info.sig_install_limit:
+                return CheckLicenseResponse(success=False, error=status.INSTALLATIONS_LIMIT)
     # Check sessions limit
-    if sig.product.sig_sessions_limit is not None and \
-            len(await search_sessions(sig.id)) >= sig.product.sig_sessions_limit:
+    if info.sig_sessions_limit is not None and \
+            len(await search_sessions(info.signature_id)) >= info.sig_sessions_limit:
         return CheckLicenseResponse(False, error=status.SESSIONS_LIMIT)
     # If all Ok, activate Signature if needed
-    if sig.activation_date is None:
-        sig.activation_date = datetime.utcnow()
+    # (cached info may be stale, so the date is set only if it's still empty in DB)
+    outdated = info.activation_date is None
+    if outdated:
+        await _activate(info, session)
+        error = status.INVALID_KEY if info.activation_date is None else \
+            status.LICENSE_EXPIRED if _expired(info) else None
+        if error is not None:
+            await invalidate_license_info(license_key)
+            return CheckLicenseResponse(success=False, error=error)
     # And register installation if it's a new one
     if current_inst is None:
-        current_inst = models.Installation(signature_id=sig.id, fingerprint=fingerprint)
+        current_inst = models.Installation(signature_id=info.signature_id, fingerprint=fingerprint)
         session.add(current_inst)
-        await session.commit()
+    await session.commit()
+    if outdated:
+        await invalidate_license_info(license_key)
     # Start a new session for this signature
-    sig_ends = int((sig.product.sig_period + sig.activation_date).timestamp()) \
-        if sig.product.sig_period is not None else None
-    session_id = await create_session(sig.id, signature_ends=sig_ends)
-    return CheckLicenseResponse(success=True, session_id=session_id)
+    sig_ends = int((info.sig_period + info.activation_date).timestamp()) \
+        if info.sig_period is not None else None
+    session_id = await create_session(info.signature_id, signature_ends=sig_ends)
+    return CheckLicenseResponse(success=True, session_id=session_id,
+                                additional_content_signature=info.additional_content_signature,
+                                additional_content_product=info.additional_content_product)
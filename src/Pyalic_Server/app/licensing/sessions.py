@@ -28,17 +28,16 @@ async def create_session(signature_id: int, signature_ends: int | None) -> str:
     :param signature_ends: Timestamp when session must be ended because of signature expiration
     :return: Session ID
     """
-    session_id = _random_session_id(signature_id, signature_ends or 0)
-    while await redis.exists(session_id):
-        # While current ID already exists, create different one
-        session_id = _random_session_id(signature_id, signature_ends or 0)
-    # Add session to redis
     if signature_ends is None or signature_ends - config.SESSION_ALIVE_PERIOD > datetime.now().timestamp():
         # Signature doesn't expire end before session should expire
-        await redis.set(session_id, 1, ex=config.SESSION_ALIVE_PERIOD)
+        expiration = {"ex": config.SESSION_ALIVE_PERIOD}
     else:
         # Signature must be expired with session
-        await redis.set(session_id, 1, exat=signature_ends)
+        expiration = {"exat": signature_ends}
+    # Add session to redis; With `nx` it's not set if current ID already exists, so then create different one
+    session_id = _random_session_id(signature_id, signature_ends or 0)
+    while not await redis.set(session_id, 1, nx=True, **expiration):
+        session_id = _random_session_id(signature_id, signature_ends or 0)
     await logger.info(f"Created new session {session_id}")
     return session_id
 
@@ -48,17 +47,21 @@ async def keep_alive(session_id: str):
     Keep-alive session
     :param session_id: Session ID
     """
-    if not await redis.exists(session_id):
-        raise SessionNotFoundException
-    signature_ends = int(session_id.split(":")[1])
+    try:
+        signature_ends = int(session_id.split(":")[1])
+    except (IndexError, ValueError) as exc:  # It's not a valid session ID
+        raise SessionNotFoundException from exc
     if signature_ends == 0:
         signature_ends = None
+    # Only prolong expiration of the existing key, so ended session can't be revived
     if signature_ends is None or signature_ends - config.SESSION_ALIVE_PERIOD > datetime.now().timestamp():
         # Signature doesn't expire end before session should expire
-        await redis.set(session_id, 1, ex=config.SESSION_ALIVE_PERIOD)
+        prolonged = await redis.expire(session_id, config.SESSION_ALIVE_PERIOD)
     else:
         # Signature must be expired with session
-        await redis.set(session_id, 1, exat=signature_ends)
+        prolonged = await redis.expireat(session_id, signature_ends)
+    if not prolonged:  # Session doesn't exist
+        raise SessionNotFoundException
 
 
 async def end_session(session_id: str):
@@ -66,9 +69,8 @@ async def end_session(session_id: str):
     Correctly end session
     :param session_id: Session ID
     """
-    if not await redis.exists(session_id):
+    if not await redis.delete(session_id):  # Just delete session from redis, if nothing deleted it doesn't exist
         raise SessionNotFoundException
-    await redis.delete(session_id)  # Just delete session from redis
     await logger.info(f"Ended session {session_id}")
 
 
@@ -1,75 +1,147 @@
 """
 Routers for only admin access
 """
+from contextlib import contextmanager
 from datetime import timedelta, datetime
-from copy import copy
 from fastapi import APIRouter, HTTPException, Depends, status, security, Query
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import func, delete, update, exists, true, false
+from sqlalchemy.orm import raiseload, aliased
 
 from .. import schema, config
 from ..db import session_dep, models
 from ..loggers import logger
 from ..access import auth
+from ..licensing import cache as lic_cache
 
 router = APIRouter(dependencies=[Depends(auth.get_current_user)])  # Requires user logged in
-public_router = APIRouter()  # Not requires login (also used to get token)
+public_router = APIRouter()  # Without router-wide auth (used to get token; routes here authenticate by JWT themselves)
 
+UNIQUE_VIOLATION = "23505"  # SQLSTATE of violated unique constraint
 
-async def _get_user_with_prod(current_user: schema.User, session: AsyncSession) -> models.User:
-    """Gets user from DB using `User` scheme, with its products"""
-    r = await session.execute(
-        select(models.User).filter_by(id=current_user.id).options(selectinload(models.User.owned_products)))
-    user_in_db = r.scalar_one_or_none()
-    assert user_in_db is not None
-    return user_in_db
 
+@contextmanager
+def _duplicate_as(status_code: int, detail: str):
+    """Turn violation of unique constraint in the block (duplicate name, key, etc.) into `HTTPException`"""
+    try:
+        yield
+    except IntegrityError as exc:
+        if getattr(exc.orig, 'pgcode', None) != UNIQUE_VIOLATION:
+            raise
+        raise HTTPException(status_code=status_code, detail=detail) from exc
+
+
+def _page(items: list, limit: int) -> tuple[list, int | None]:
+    """
+    Cut page out of items fetched with one extra item (`limit + 1`), which tells whether there're more of them
+    :return: Items of the page and cursor for keyset pagination (`after_id` of the next page),
+    or `None` if there're no more items
+    """
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, items[-1].id if items else None
+
+
+def _signatures_count():
+    """Correlated subquery counting signatures of the selected product"""
+    return select(func.count(models.Signature.id)).where(  # pylint: disable=not-callable
+        models.Signature.product_id == models.Product.id).correlate(models.Product).scalar_subquery()
+
+
+def _installations_count():
+    """Correlated subquery counting installations of the selected signature"""
+    return select(func.count(models.Installation.id)).where(  # pylint: disable=not-callable
+        models.Installation.signature_id == models.Signature.id).correlate(models.Signature).scalar_subquery()
+
+
+def _owned_by(current_user: models.User, product_id):
+    """Correlated subquery checking if the product with `product_id` is owned by user"""
+    return exists().where(models.user_product_table.c.user_id == current_user.id,
+                          models.user_product_table.c.product_id == product_id)
 
-async def _get_user(current_user: schema.User, session: AsyncSession) -> models.User:
-    """Gets user from DB using `User` scheme"""
-    r = await session.execute(
-        select(models.User).filter_by(id=current_user.id))
-    user_in_db = r.scalar_one_or_none()
-    assert user_in_db is not None
-    return user_in_db
+
+def _access_condition(own: bool, other: bool, owned):
+    """
+    Condition matching objects which are accessible with given permissions
+    :param own: Whether access to own objects is permitted
+    :param other: Whether access to others objects is permitted
+    :param owned: Condition of ownership of the object
+    """
+    if own and other:
+        return true()
+    if own:
+        return owned
+    if other:
+        return ~owned
+    return false()
+
+
+def _readable_by(current_user: models.User, product_id):
+    """Condition matching products with `product_id` which user is able to get, according to his permissions"""
+    perms = current_user.get_permissions()
+    return _access_condition(perms.can_manage_own_products(), perms.can_read_other_products(),
+                             _owned_by(current_user, product_id))
+
+
+def _editable_by(current_user: models.User, product_id):
+    """Condition matching products with `product_id` which user is able to edit, according to his permissions"""
+    perms = current_user.get_permissions()
+    return _access_condition(perms.can_manage_own_products(), perms.can_manage_other_products(),
+                             _owned_by(current_user, product_id))
+
+
+def _users_editable_by(current_user: models.User):
+    """Condition matching users which user is able to edit, according to his permissions"""
+    perms = current_user.get_permissions()
+    # User is owned by his master; Users without master aren't owned by anyone
+    return _access_condition(perms.can_manage_own_users(), perms.can_manage_other_users(),
+                             models.User.master_id.is_not_distinct_from(current_user.id))
+
+
+async def _unavailable(session: AsyncSession, model, obj_id: int, not_found_detail: str) -> HTTPException:
+    """
+    Find out why the object wasn't matched by a query with access condition
+    :return: `HTTPException` with 404 if object doesn't exist, or with 403 otherwise
+    """
+    r = await session.execute(select(exists().where(model.id == obj_id)))
+    if not r.scalar():
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=not_found_detail)
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
 
 
 @router.get("/product", response_model=schema.GetProduct)
 async def get_product(p_id: int = Query(alias="id"),
                       session: AsyncSession = Depends(session_dep),
-                      current_user: schema.User = Depends(auth.get_current_user)):
+                      current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for getting product"""
-    # Get product from DB
-    r = await session.execute(select(models.Product).filter_by(id=p_id).options(
-        selectinload(models.Product.signatures)))
-    p = r.scalar_one_or_none()
-    if p is None:  # If not exists
+    # Get product from DB with quantity of its signatures and its ownership
+    r = await session.execute(select(models.Product, _signatures_count(),
+                                     _owned_by(current_user, models.Product.id))
+                              .filter_by(id=p_id).options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    p, sig_count, owned = row
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_get_product(p):
+    if not current_user.get_permissions().able_get_product(owned):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # If all is ok, return product
     sig_period = p.sig_period.total_seconds() if p.sig_period is not None else None
     return schema.GetProduct(name=p.name, sig_install_limit=p.sig_install_limit,
                              sig_sessions_limit=p.sig_sessions_limit, sig_period=sig_period,
-                             additional_content=p.additional_content, id=p.id, signatures=len(p.signatures))
+                             additional_content=p.additional_content, id=p.id, signatures=sig_count)
 
 
 @router.post("/product", response_model=schema.GetProduct)
 async def add_product(payload: schema.AddProduct,
                       session: AsyncSession = Depends(session_dep),
-                      current_user: schema.User = Depends(auth.get_current_user)):
+                      current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for adding product"""
-    # Check if product with specified name already exists
-    r = await session.execute(select(models.Product).filter_by(name=payload.name))
-    if r.unique().scalars().first() is not None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Product with specified name already exists")
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_add_product():
+    if not current_user.get_verifiable_permissions().able_add_product():
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # Create a product
     p = models.Product(name=payload.name,
@@ -77,12 +149,12 @@ async def add_product(payload: schema.AddProduct,
                        sig_sessions_limit=payload.sig_sessions_limit,
                        sig_period=timedelta(seconds=payload.sig_period) if payload.sig_period is not None else None,
                        additional_content=payload.additional_content)
+    # Attach the owner before the flush, so the product and the link row are inserted at once
+    p.owners.append(current_user)
     session.add(p)
-    await session.commit()
-    await session.refresh(p)
-    user_in_db.owned_products.append(p)
-    await session.commit()
-    await session.refresh(p)
+    # Check if product with specified name already exists by unique constraint
+    with _duplicate_as(status.HTTP_400_BAD_REQUEST, "Product with specified name already exists"):
+        await session.commit()
     await logger.info(f"Added new product \"{p.name}\" with id={p.id}")
     # Return this product
     sig_period = p.sig_period.total_seconds() if p.sig_period is not None else None
@@ -95,166 +167,176 @@ async def add_product(payload: schema.AddProduct,
 async def update_product(payload: schema.UpdateProduct,
                          p_id: int = Query(alias="id"),
                          session: AsyncSession = Depends(session_dep),
-                         current_user: schema.User = Depends(auth.get_current_user)):
+                         current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for updating existing product"""
-    # Get product
-    r = await session.execute(select(models.Product).filter_by(id=p_id).options(
-        selectinload(models.Product.signatures)))
-    p = r.scalar_one_or_none()
-    if p is None:  # If not exists
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_edit_product(p):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Check every field if it is filled (autofill mechanics here)
-    if 'name' not in payload.unspecified_fields:
-        # Check isn't there an existing product with the same name
-        r = await session.execute(select(models.Product).filter_by(name=payload.name))
-        if r.unique().scalars().first() is not None:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Product with specified name already exists")
-        p.name = copy(payload.name)
-    if 'sig_install_limit' not in payload.unspecified_fields:
-        p.sig_install_limit = copy(payload.sig_install_limit)
-    if 'sig_sessions_limit' not in payload.unspecified_fields:
-        p.sig_sessions_limit = copy(payload.sig_sessions_limit)
+    # Collect every filled field (autofill mechanics here)
+    changes = {}
+    for field in ('name', 'sig_install_limit', 'sig_sessions_limit', 'additional_content'):
+        if field not in payload.unspecified_fields:
+            changes[field] = getattr(payload, field)
     if 'sig_period' not in payload.unspecified_fields:
-        p.sig_period = timedelta(seconds=payload.sig_period) if payload.sig_period is not None else None
-    if 'additional_content' not in payload.unspecified_fields:
-        p.additional_content = copy(payload.additional_content)
-    # Update the product
+        changes['sig_period'] = timedelta(seconds=payload.sig_period) if payload.sig_period is not None else None
+    # Update the product if user is able to edit it, getting it back with quantity of its signatures
+    condition = (models.Product.id == p_id, _editable_by(current_user, models.Product.id))
+    if changes:
+        # Unique constraint checks if there's an existing product with the same name
+        with _duplicate_as(status.HTTP_400_BAD_REQUEST, "Product with specified name already exists"):
+            r = await session.execute(update(models.Product).where(*condition).values(**changes)
+                                      .returning(models.Product, _signatures_count()))
+    else:  # Nothing to update
+        r = await session.execute(select(models.Product, _signatures_count()).where(*condition)
+                                  .options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:
+        raise await _unavailable(session, models.Product, p_id, "Product not found")
+    p, sig_count = row
     await session.commit()
-    await session.refresh(p)
+    # Forget cached info of product's license keys if licensing fields were changed
+    if {'sig_install_limit', 'sig_sessions_limit', 'sig_period', 'additional_content'} - payload.unspecified_fields:
+        r = await session.execute(select(models.Signature.license_key).filter_by(product_id=p.id))
+        await lic_cache.invalidate_license_info(*r.scalars())
     sig_period = p.sig_period.total_seconds() if p.sig_period is not None else None
     await logger.info(f"Updated product \"{p.name}\" with id={p.id}")
     return schema.GetProduct(name=p.name, sig_install_limit=p.sig_install_limit,
                              sig_sessions_limit=p.sig_sessions_limit, sig_period=sig_period,
-                             additional_content=p.additional_content, id=p.id, signatures=len(p.signatures))
+                             additional_content=p.additional_content, id=p.id, signatures=sig_count)
 
 
 @router.delete("/product", response_model=schema.Successful)
 async def delete_product(p_id: int = Query(alias="id"),
                          session: AsyncSession = Depends(session_dep),
-                         current_user: schema.User = Depends(auth.get_current_user)):
+                         current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for deleting existing product"""
-    # Get product with all relations
-    r = await session.execute(select(models.Product).filter_by(id=p_id).options(
-        selectinload(models.Product.signatures).selectinload(models.Signature.installations)))
-    p = r.scalar_one_or_none()
-    if p is None:  # If not exists
+    # Get product with its ownership
+    r = await session.execute(select(models.Product, _owned_by(current_user, models.Product.id))
+                              .filter_by(id=p_id).options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    p, owned = row
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_delete_product(p):
+    if not current_user.get_permissions().able_delete_product(owned):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Firstly clean signatures
-    for sig in p.signatures:
-        # And installations
-        for inst in sig.installations:
-            await session.delete(inst)
-        await session.delete(sig)
+    # Firstly clean installations of all product's signatures
+    product_signatures = select(models.Signature.id).filter_by(product_id=p.id)
+    await session.execute(delete(models.Installation)
+                          .where(models.Installation.signature_id.in_(product_signatures))
+                          .execution_options(synchronize_session=False))
+    # Then signatures and owners of the product
+    r = await session.execute(delete(models.Signature).filter_by(product_id=p.id)
+                              .returning(models.Signature.license_key))
+    license_keys = r.scalars().all()
+    await session.execute(delete(models.user_product_table).where(models.user_product_table.c.product_id == p.id))
     p_name = p.name
     p_id = p.id
     # Delete the product
-    await session.delete(p)
+    await session.execute(delete(models.Product).filter_by(id=p.id))
     await session.commit()
+    await lic_cache.invalidate_license_info(*license_keys)
     await logger.info(f"Deleted product \"{p_name}\" with id={p_id}")
     return schema.Successful()  # Return {success: true}
 
 
 @router.get("/list_products", response_model=schema.ListProducts)
-async def list_products(limit: int = 100, offset: int = 0, session: AsyncSession = Depends(session_dep)):
+async def list_products(limit: int = 100, offset: int = 0, after_id: int | None = None,
+                        session: AsyncSession = Depends(session_dep)):
     """Request handler for getting list of all products"""
-    # Get all products from DB
+    # Get all products from DB with quantity of their signatures
+    query = select(models.Product, func.count(models.Signature.id))  # pylint: disable=not-callable
+    if after_id is not None:  # Keyset pagination
+        query = query.where(models.Product.id > after_id)
     r = await session.execute(
-        select(models.Product).order_by(models.Product.id).offset(offset).limit(limit).options(
-            selectinload(models.Product.signatures)))
+        query.outerjoin(models.Signature).group_by(models.Product.id)
+        .order_by(models.Product.id).offset(offset).limit(limit + 1).options(raiseload('*')))
     p_list = []
     # List them
-    for p in r.scalars():
+    for p, sig_count in r:
         sig_period = p.sig_period.total_seconds() if p.sig_period is not None else None
         p_list.append(schema.ListedProduct(id=p.id, name=p.name, sig_install_limit=p.sig_install_limit,
                                            sig_sessions_limit=p.sig_sessions_limit, sig_period=sig_period,
-                                           signatures=len(p.signatures)))
-    return schema.ListProducts(products=p_list, items=len(p_list))
+                                           signatures=sig_count))
+    p_list, next_cursor = _page(p_list, limit)
+    return schema.ListProducts(products=p_list, items=len(p_list), next_cursor=next_cursor)
 
 
 @router.get("/list_signatures", response_model=schema.ListSignatures)
-async def list_signatures(product_id: int,
+async def list_signatures(product_id: int,  # pylint: disable=too-many-arguments
+                          *,
                           limit: int = 100,
                           offset: int = 0,
+                          after_id: int | None = None,
                           session: AsyncSession = Depends(session_dep),
-                          current_user: schema.User = Depends(auth.get_current_user)):
+                          current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for getting list of signatures of specified product"""
-    # Get product from DB
-    r = await session.execute(select(models.Product).filter_by(id=product_id))
-    p = r.scalar_one_or_none()
-    if p is None:  # If not exists
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    user_in_db = await _get_user_with_prod(current_user, session)
-    # Check permission to perform this action
-    if not user_in_db.get_verifiable_permissions().able_get_product(p):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Get signatures
-    r = await session.execute(select(models.Signature).filter_by(product_id=product_id)
-                              .order_by(models.Signature.id).offset(offset).limit(limit))
+    # Get signatures, filtering out the product if user has no permission to get it
+    query = select(models.Signature.id, models.Signature.comment).where(
+        models.Signature.product_id == product_id, _readable_by(current_user, models.Signature.product_id))
+    if after_id is not None:  # Keyset pagination
+        query = query.where(models.Signature.id > after_id)
+    r = await session.execute(query.order_by(models.Signature.id).offset(offset).limit(limit + 1))
     sig_list = []
-    for sig in r.scalars():
-        sig_list.append(schema.ShortSignature(comment=sig.comment, id=sig.id))
+    for sig_id, comment in r:
+        sig_list.append(schema.ShortSignature(comment=comment, id=sig_id))
+    if not sig_list:  # Product may not exist or be unavailable, so find out the reason
+        r = await session.execute(select(_owned_by(current_user, models.Product.id))
+                                  .where(models.Product.id == product_id))
+        owned = r.scalar_one_or_none()
+        if owned is None:  # If not exists
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        # Check permission to perform this action
+        if not current_user.get_permissions().able_get_product(owned):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # Return list of signatures
-    return schema.ListSignatures(items=len(sig_list), signatures=sig_list, product_id=product_id)
+    sig_list, next_cursor = _page(sig_list, limit)
+    return schema.ListSignatures(items=len(sig_list), signatures=sig_list, product_id=product_id,
+                                 next_cursor=next_cursor)
 
 
 @router.get("/signature", response_model=schema.GetSignature)
 async def get_signature(s_id: int = Query(alias="id"),
                         session: AsyncSession = Depends(session_dep),
-                        current_user: schema.User = Depends(auth.get_current_user)):
+                        current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for getting signature info"""
-    # Get signature from DB
+    # Get signature from DB with quantity of its installations and ownership of its product
     r = await session.execute(
-        select(models.Signature).filter_by(id=s_id).options(
-            selectinload(models.Signature.installations), selectinload(models.Signature.product)))
-    sig = r.scalar_one_or_none()
-    if sig is None:  # If not exists
+        select(models.Signature, _installations_count(), _owned_by(current_user, models.Signature.product_id))
+        .filter_by(id=s_id).options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Signature not found")
+    sig, installed, owned = row
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_get_product(sig.product):
+    if not current_user.get_permissions().able_get_product(owned):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     act_date = None if sig.activation_date is None else sig.activation_date.isoformat()
     # Return signature
     return schema.GetSignature(id=sig.id, license_key=sig.license_key, additional_content=sig.additional_content,
-                               comment=sig.comment, installed=len(sig.installations), product_id=sig.product_id,
+                               comment=sig.comment, installed=installed, product_id=sig.product_id,
                                activation_date=act_date)
 
 
 @router.post("/signature", response_model=schema.GetSignature)
 async def add_signature(payload: schema.AddSignature,
                         session: AsyncSession = Depends(session_dep),
-                        current_user: schema.User = Depends(auth.get_current_user)):
+                        current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for adding new signature of specified product"""
-    # Check if there's a signature with the same license key
-    r = await session.execute(select(models.Signature).filter_by(license_key=payload.license_key))
-    if r.scalar_one_or_none() is not None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                            detail="Signature with specified license key already exists")
-    # Get product from DB
-    r = await session.execute(select(models.Product).filter_by(id=payload.product_id))
-    p = r.scalar_one_or_none()
-    if p is None:  # If not exists
+    # Get product's ownership if product exists
+    r = await session.execute(select(_owned_by(current_user, models.Product.id))
+                              .where(models.Product.id == payload.product_id))
+    owned = r.scalar_one_or_none()
+    if owned is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_edit_product(p):
+    if not current_user.get_permissions().able_edit_product(owned):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # Create signature
     sig = models.Signature(license_key=payload.license_key, additional_content=payload.additional_content,
                            comment=payload.comment, product_id=payload.product_id,
                            activation_date=None if not payload.activate else datetime.utcnow())
     session.add(sig)
-    await session.commit()
-    await session.refresh(sig)
+    # Check if another signature has the same license key by unique constraint
+    with _duplicate_as(status.HTTP_400_BAD_REQUEST, "Signature with specified license key already exists"):
+        await session.commit()
     act_date = None if sig.activation_date is None else sig.activation_date.isoformat()
     await logger.info(f"Added new signature with id={sig.id} of product_id={payload.product_id}")
     # Return signature
@@ -266,73 +348,67 @@ async def add_signature(payload: schema.AddSignature,
 async def update_signature(payload: schema.UpdateSignature,
                            s_id: int = Query(alias="id"),
                            session: AsyncSession = Depends(session_dep),
-                           current_user: schema.User = Depends(auth.get_current_user)):
+                           current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for updating an existing signature"""
-    # Get signature from db
-    r = await session.execute(
-        select(models.Signature).filter_by(id=s_id).options(
-            selectinload(models.Signature.installations), selectinload(models.Signature.product)))
-    sig = r.scalar_one_or_none()
-    if sig is None:  # If not exists
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Signature not found")
-    # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_edit_product(sig.product):
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Check every field if it is filled (autofill mechanics)
-    if 'license_key' not in payload.unspecified_fields:
-        # Check if another signature has the same license key
-        r = await session.execute(select(models.Signature).filter_by(license_key=payload.license_key))
-        if r.unique().scalars().first() is not None:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Signature with specified license key already exists")
-        sig.license_key = copy(payload.license_key)
-    if 'comment' not in payload.unspecified_fields:
-        sig.comment = copy(payload.comment)
-    if 'additional_content' not in payload.unspecified_fields:
-        sig.additional_content = copy(payload.additional_content)
-    # Update signature
+    # Collect every filled field (autofill mechanics)
+    changes = {}
+    for field in ('license_key', 'comment', 'additional_content'):
+        if field not in payload.unspecified_fields:
+            changes[field] = getattr(payload, field)
+    # Update signature if user is able to edit its product, getting it back with quantity of installations
+    condition = (models.Signature.id == s_id, _editable_by(current_user, models.Signature.product_id))
+    if changes:
+        # Subquery in RETURNING sees the row from before the update, so old license key can be forgotten by cache
+        old = aliased(models.Signature)
+        old_license_key = select(old.license_key).where(old.id == models.Signature.id).scalar_subquery()
+        # Unique constraint checks if another signature has the same license key
+        with _duplicate_as(status.HTTP_400_BAD_REQUEST, "Signature with specified license key already exists"):
+            r = await session.execute(update(models.Signature).where(*condition).values(**changes)
+                                      .returning(models.Signature, _installations_count(), old_license_key))
+    else:  # Nothing to update
+        r = await session.execute(select(models.Signature, _installations_count(), models.Signature.license_key)
+                                  .where(*condition).options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:
+        raise await _unavailable(session, models.Signature, s_id, "Signature not found")
+    sig, installed, old_license_key = row
     await session.commit()
-    await session.refresh(sig)
+    await lic_cache.invalidate_license_info(old_license_key)
     await logger.info(f"Updated signature with id={sig.id}")
     # Return signature
     act_date = None if sig.activation_date is None else sig.activation_date.isoformat()
     return schema.GetSignature(id=sig.id, license_key=sig.license_key, additional_content=sig.additional_content,
-                               comment=sig.comment, installed=len(sig.installations), product_id=sig.product_id,
+                               comment=sig.comment, installed=installed, product_id=sig.product_id,
                                activation_date=act_date)
 
 
 @router.delete("/signature", response_model=schema.Successful)
 async def delete_signature(s_id: int = Query(alias="id"),
                            session: AsyncSession = Depends(session_dep),
-                           current_user: schema.User = Depends(auth.get_current_user)):
+                           current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for deleting an existing signature"""
-    # Get signature form DB
-    r = await session.execute(select(models.Signature).filter_by(id=s_id))
-    sig = r.scalar_one_or_none()
-    if sig is None:  # If not exists
+    # Get signature form DB with ownership of its product
+    r = await session.execute(select(models.Signature, _owned_by(current_user, models.Signature.product_id))
+                              .filter_by(id=s_id).options(raiseload('*')))
+    row = r.one_or_none()
+    if row is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Signature not found")
-    # If exists, get it with relations
-    r = await session.execute(select(models.Signature).filter_by(id=s_id)
-                              .options(selectinload(models.Signature.installations),
-                                       selectinload(models.Signature.product)))
-    sig = r.scalar_one_or_none()
+    sig, owned = row
     # Check permission to perform this action
-    user_in_db = await _get_user_with_prod(current_user, session)
-    if not user_in_db.get_verifiable_permissions().able_edit_product(sig.product):
+    if not current_user.get_permissions().able_edit_product(owned):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # Firstly delete all installations
-    for inst in sig.installations:
-        await session.delete(inst)
+    await session.execute(delete(models.Installation).filter_by(signature_id=sig.id))
     # Delete signature
-    await session.delete(sig)
+    await session.execute(delete(models.Signature).filter_by(id=sig.id))
     await session.commit()
+    await lic_cache.invalidate_license_info(sig.license_key)
     await logger.info(f"Deleted signature with id={sig.id}")
     return schema.Successful()  # Return {success: true}
 
 
 @public_router.post("/token", response_model=schema.Token)
-async def login_for_access_token(form_data: security.OAuth2PasswordRequestForm = Depends(),
+async def login_for_access_token(form_data: security.OAuth2PasswordRequestForm = Depends(auth.password_request_form),
                                  session: AsyncSession = Depends(session_dep)):
     """Authorization request handler for getting JWT token"""
     user = await auth.authenticate_user(form_data.username, form_data.password, session)
@@ -345,26 +421,32 @@ async def login_for_access_token(form_data: security.OAuth2PasswordRequestForm =
     # Create token
     access_token_expires = timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.get("/users/me/", response_model=schema.User)
-async def users_me(current_user: schema.User = Depends(auth.get_current_user)):
-    """Responding `whoami` request"""
+@public_router.get("/users/me/", response_model=schema.User)
+async def users_me(current_user: schema.User = Depends(auth.get_current_user_from_jwt)):
+    """Responding `whoami` request (user is got from JWT token without DB)"""
     return current_user
 
 
 @router.get("/users/list", response_model=schema.ListUsers)
-async def list_users(limit: int = 100, offset: int = 0, session: AsyncSession = Depends(session_dep)):
+async def list_users(limit: int = 100, offset: int = 0, after_id: int | None = None,
+                     session: AsyncSession = Depends(session_dep)):
     """Request handler for getting list of all users"""
-    r = await session.execute(select(models.User).order_by(models.User.id).offset(offset).limit(limit))
+    query = select(models.User)
+    if after_id is not None:  # Keyset pagination
+        query = query.where(models.User.id > after_id)
+    r = await session.execute(query.order_by(models.User.id).offset(offset).limit(limit + 1)
+                              .options(raiseload('*')))
     users = []
     # List all users
     for u in r.scalars():
         users.append(schema.User(id=u.id, username=u.username))
-    return schema.ListUsers(items=len(users), users=users)
+    users, next_cursor = _page(users, limit)
+    return schema.ListUsers(items=len(users), users=users, next_cursor=next_cursor)
 
 
 @router.get("/users/user", response_model=schema.ExpandedUser)
@@ -372,7 +454,7 @@ async def get_user(u_id: int = Query(alias="id"),
                    session: AsyncSession = Depends(session_dep)):
     """Request handler for getting User by his ID"""
     # Get user from DB
-    r = await session.execute(select(models.User).filter_by(id=u_id))
+    r = await session.execute(select(models.User).filter_by(id=u_id).options(raiseload('*')))
     u = r.scalar_one_or_none()
     if u is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
@@ -382,24 +464,23 @@ async def get_user(u_id: int = Query(alias="id"),
 @router.post("/users/user", response_model=schema.ExpandedUser)
 async def add_user(payload: schema.AddUser,
                    session: AsyncSession = Depends(session_dep),
-                   current_user: schema.User = Depends(auth.get_current_user)):
+                   current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for adding new user with specified parameters"""
     # Check permission to perform this action
-    current_user_in_db = await _get_user(current_user, session)
-    if not current_user_in_db.get_verifiable_permissions().able_add_user(payload.permissions):
+    if not current_user.get_verifiable_permissions().able_add_user(payload.permissions):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Check if someone already has this username
-    r = await session.execute(select(models.User).filter_by(username=payload.username))
-    if r.scalar_one_or_none() is not None:
-        raise HTTPException(status_code=409, detail="User with specified username already exists")
+    # Release DB connection while waiting for the hashing pool
+    await session.commit()
+    hashed_password = await auth.hash_password(payload.password)
     # Create user
     u = models.User(username=payload.username,
-                    hashed_password=auth.get_password_hash(payload.password),
+                    hashed_password=hashed_password,
                     permissions=payload.permissions,
-                    master_id=current_user_in_db.id)
+                    master_id=current_user.id)
     session.add(u)
-    await session.commit()
-    await session.refresh(u)
+    # Check if someone already has this username by unique constraint
+    with _duplicate_as(status.HTTP_409_CONFLICT, "User with specified username already exists"):
+        await session.commit()
     # Return user
     return schema.ExpandedUser(id=u.id, username=u.username, master_id=u.master_id, permissions=u.permissions)
 
@@ -408,30 +489,39 @@ async def add_user(payload: schema.AddUser,
 async def update_user(payload: schema.UpdateUser,
                       u_id: int = Query(alias="id"),
                       session: AsyncSession = Depends(session_dep),
-                      current_user: schema.User = Depends(auth.get_current_user)):
+                      current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for updating an existing user"""
-    # Get user form db
-    r = await session.execute(select(models.User).filter_by(id=u_id))
-    u = r.scalar_one_or_none()
-    if u is None:  # If not exists
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    # Check permission to perform this action
-    current_user_in_db = await _get_user(current_user, session)
-    if not current_user_in_db.get_verifiable_permissions().able_edit_user(u, payload.permissions):
+    perms = current_user.get_verifiable_permissions()
+    # Check permission to grant new permissions (the rest is checked while updating)
+    if payload.permissions is not None and not perms.able_grant(payload.permissions):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
-    # Check every field if it is filled (autofill mechanics)
+    condition = (models.User.id == u_id, _users_editable_by(current_user))
+    # Collect every filled field (autofill mechanics)
+    changes = {}
     if 'username' not in payload.unspecified_fields:
-        # Check if someone already has this username
-        r = await session.execute(select(models.User).filter_by(username=payload.username))
-        if r.scalar_one_or_none() is not None:
-            raise HTTPException(status_code=409, detail="User with specified username already exists")
-        u.username = copy(payload.username)
+        changes['username'] = payload.username
     if 'password' not in payload.unspecified_fields:
-        u.hashed_password = auth.get_password_hash(payload.password)
+        # Hashing is expensive, so make sure the user is able to be updated before it
+        r = await session.execute(select(exists().where(*condition)))
+        if not r.scalar():
+            raise await _unavailable(session, models.User, u_id, "User not found")
+        # Release DB connection while waiting for the hashing pool
+        await session.commit()
+        changes['hashed_password'] = await auth.hash_password(payload.password)
     if 'permissions' not in payload.unspecified_fields:
-        u.permissions = copy(payload.permissions)
+        changes['permissions'] = payload.permissions
+    # Update user if current user is able to edit him, getting him back
+    columns = (models.User.id, models.User.username, models.User.master_id, models.User.permissions)
+    if changes:
+        # Unique constraint checks if someone already has this username
+        with _duplicate_as(status.HTTP_409_CONFLICT, "User with specified username already exists"):
+            r = await session.execute(update(models.User).where(*condition).values(**changes).returning(*columns))
+    else:  # Nothing to update
+        r = await session.execute(select(*columns).where(*condition))
+    u = r.one_or_none()
+    if u is None:
+        raise await _unavailable(session, models.User, u_id, "User not found")
     await session.commit()
-    await session.refresh(u)
     # Return user
     return schema.ExpandedUser(id=u.id, username=u.username, master_id=u.master_id, permissions=u.permissions)
 
@@ -439,16 +529,15 @@ async def update_user(payload: schema.UpdateUser,
 @router.delete("/users/user", response_model=schema.Successful)
 async def delete_user(u_id: int = Query(alias="id"),
                       session: AsyncSession = Depends(session_dep),
-                      current_user: schema.User = Depends(auth.get_current_user)):
+                      current_user: models.User = Depends(auth.get_current_user)):
     """Request handler for deleting an existing user"""
     # Get user from DB
-    r = await session.execute(select(models.User).filter_by(id=u_id))
+    r = await session.execute(select(models.User).filter_by(id=u_id).options(raiseload('*')))
     u = r.scalar_one_or_none()
     if u is None:  # If not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    # Check every field if it is filled (autofill mechanics)
-    current_user_in_db = await _get_user(current_user, session)
-    if not current_user_in_db.get_verifiable_permissions().able_delete_user(u):
+    # Check permission to perform this action
+    if not current_user.get_verifiable_permissions().able_delete_user(u):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You have no permission")
     # Delete user
     await session.delete(u)
@@ -2,41 +2,38 @@
 User's api for checking license and managing session
 """
 from fastapi import APIRouter, HTTPException, status, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 from .. import schema
 from ..licensing import engine as lic_engine
 from ..licensing import sessions as lic_sessions
-from ..db import session_dep, models
+from ..db import session_dep
 from ..loggers import logger
 
 router = APIRouter()
 
+# Handlers of hot endpoints return responses directly, so they're serialized by orjson without validation;
+# Response with constant content is rendered once and reused
+SUCCESSFUL_RESPONSE = ORJSONResponse(content={"success": True})
 
-@router.post("/check_license")
+
+@router.post("/check_license", response_class=ORJSONResponse,
+             responses={200: {"model": schema.GoodLicense}, 403: {"model": schema.BadLicense}})
 async def check_license(payload: schema.CheckLicense, session: AsyncSession = Depends(session_dep)):
     """Request handler for checking license and creating a new Session with ID"""
     # Process check request via licensing engine
     check_resp = await lic_engine.process_check_request(payload.license_key, payload.fingerprint, session)
     if check_resp.success:  # If access granted
-        # Get signature
-        r = await session.execute(select(models.Signature).filter_by(license_key=payload.license_key).options(
-            selectinload(models.Signature.product)))
-        sig = r.scalar_one_or_none()
-        if sig is None:  # If signature not exists
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
-        return schema.GoodLicense(session_id=check_resp.session_id, additional_content_signature=sig.additional_content,
-                                  additional_content_product=sig.product.additional_content)
+        return ORJSONResponse(content={"success": True, "session_id": check_resp.session_id,
+                                       "additional_content_signature": check_resp.additional_content_signature,
+                                       "additional_content_product": check_resp.additional_content_product})
     # If something went wrong
     await logger.warning(f"Access denied (key={payload.license_key}), message: {check_resp.error}")
-    resp = schema.BadLicense(error=check_resp.error)
-    return JSONResponse(content=resp.model_dump(), status_code=403)
+    return ORJSONResponse(content={"success": False, "error": check_resp.error}, status_code=403)
 
 
-@router.post("/keepalive", response_model=schema.Successful)
+@router.post("/keepalive", response_model=schema.Successful, response_class=ORJSONResponse)
 async def keepalive(payload: schema.SessionIdField):
     """Request handler for processing keep-alive sessions"""
     try:
@@ -44,10 +41,10 @@ async def keepalive(payload: schema.SessionIdField):
     except lic_sessions.SessionNotFoundException as exc:
         # If session not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found") from exc
-    return schema.Successful()  # Return {success: true}
+    return SUCCESSFUL_RESPONSE  # Return {success: true}
 
 
-@router.post("/end_session", response_model=schema.Successful)
+@router.post("/end_session", response_model=schema.Successful, response_class=ORJSONResponse)
 async def end_session(payload: schema.SessionIdField):
     """Request handler for correctly ending session by Session ID"""
     try:
@@ -55,4 +52,4 @@ async def end_session(payload: schema.SessionIdField):
     except lic_sessions.SessionNotFoundException as exc:
         # If session not exists
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Session not found") from exc
-    return schema.Successful()  # Return {success: true}
+    return SUCCESSFUL_RESPONSE  # Return {success: true}
@@ -60,6 +60,7 @@ class Successful(BaseModel):
 class ListProducts(BaseModel):
     products: list[ListedProduct]
     items: int
+    next_cursor: int | None = None
 
 
 class ShortSignature(BaseModel):
@@ -93,6 +94,7 @@ class ListSignatures(BaseModel):
     signatures: list[ShortSignature]
     product_id: int
     items: int
+    next_cursor: int | None = None
 
 
 class CheckLicense(BaseModel):
@@ -123,6 +125,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+    uid: int | None = None
 
 
 class User(BaseModel):
@@ -141,6 +144,7 @@ class ExpandedUser(UserWithMaster):
 class ListUsers(BaseModel):
     users: list[User]
     items: int
+    next_cursor: int | None = None
 
 
 class AddUser(BaseModel):
@@ -5,8 +5,9 @@ import time
 import pytest
 from fastapi.testclient import TestClient
 from redis import Redis
+from sqlalchemy import event
 
-from ..app import config, app
+from ..app import config, app, db
 
 from . import load_db_state, save_db_state, clean_db, fill_db
 
@@ -68,3 +69,18 @@ def auth(client) -> dict[str, str]:  # pylint: disable=W0621
     r = client.request('POST', '/admin/token', data=p)
     token = r.json()['access_token']
     yield {'Authorization': f"Bearer {token}"}
+
+
+@pytest.fixture(scope="function")
+def sql_statements(client) -> list[str]:  # pylint: disable=W0621,W0613
+    """
+    Collect SQL statements executed by the application while the test is running
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):  # pylint: disable=W0613
+        statements.append(statement)
+
+    event.listen(db.ENGINE.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(db.ENGINE.sync_engine, "before_cursor_execute", before_cursor_execute)
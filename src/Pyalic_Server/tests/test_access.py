@@ -2,11 +2,14 @@
 Test all about access management and authorization
 """
 import pytest
+from fastapi.dependencies.utils import is_coroutine_callable, is_async_gen_callable
+from fastapi.routing import APIRoute
 
-from ..app import config
+from ..app import config, app, db
 from ..app.db import models
 from ..app.access.auth import check_password
 from ..app.access.auth import get_password_hash
+from ..app.access import auth as auth_module
 
 from . import rand_str, create_db_session
 
@@ -74,6 +77,48 @@ class TestAuth:
         assert 'access_token' not in r.json().keys()
         assert 'token_type' not in r.json().keys()
 
+    def test_broken_pwd_pool(self, client):
+        """Logging in must work after a worker of the hashing pool dies"""
+        p = {
+            "grant_type": "password",
+            "username": config.DEFAULT_USER,
+            "password": config.DEFAULT_PASSWORD
+        }
+        r = client.request('POST', '/admin/token', data=p)
+        assert r.status_code == 200
+        for process in auth_module.PWD_POOL._processes.values():  # pylint: disable=W0212
+            process.kill()
+            process.join()
+        r = client.request('POST', '/admin/token', data=p)
+        assert r.status_code == 200
+
+    def test_login_releases_connection(self, client, monkeypatch):
+        """DB connection mustn't be held while waiting for the hashing pool"""
+        checked_out = []
+
+        async def verify_password(*_):
+            checked_out.append(db.ENGINE.sync_engine.pool.checkedout())
+            return True
+
+        monkeypatch.setattr(auth_module, 'verify_password', verify_password)
+        p = {
+            "grant_type": "password",
+            "username": config.DEFAULT_USER,
+            "password": rand_str(16)
+        }
+        r = client.request('POST', '/admin/token', data=p)
+        assert r.status_code == 200
+        assert checked_out == [0]
+
+    def test_dependencies_are_async(self):
+        """Sync dependencies are run in threadpool, so all of them must be async"""
+        dependants = [route.dependant for route in app.routes if isinstance(route, APIRoute)]
+        while dependants:
+            dependant = dependants.pop()
+            for dep in dependant.dependencies:
+                assert is_coroutine_callable(dep.call) or is_async_gen_callable(dep.call), dep.call
+                dependants.append(dep)
+
 
 @pytest.mark.usefixtures('client', 'rebuild_db', 'auth')
 class TestUsersOperations:
@@ -95,6 +140,12 @@ class TestUsersOperations:
         j = r.json()
         assert 'id' in j.keys() and 'username' in j.keys() and j['username'] == config.DEFAULT_USER
 
+    def test_getting_me_queries(self, client, auth, sql_statements):
+        """User must be got from JWT token without DB"""
+        r = client.request('GET', '/admin/users/me', headers=auth)
+        assert r.status_code == 200
+        assert len(sql_statements) == 0
+
     def test_add_user(self, client, auth):  # pylint: disable=C0116
         username = rand_str(16)
         password = rand_str(16)
@@ -180,6 +231,38 @@ class TestUsersOperations:
         r = client.request('PUT', '/admin/users/user', json=p, params={'id': 0}, headers=auth)
         assert r.status_code == 404 and r.json()['detail'] == 'User not found'
 
+    def test_update_password_user_not_exists(self, client, auth, monkeypatch):
+        """Password mustn't be hashed if the user can't be updated"""
+
+        async def hash_password(password):
+            raise AssertionError("Password was hashed")
+
+        monkeypatch.setattr(auth_module, 'hash_password', hash_password)
+        r = client.request('PUT', '/admin/users/user', json={'password': rand_str(16)}, params={'id': 0},
+                           headers=auth)
+        assert r.status_code == 404 and r.json()['detail'] == 'User not found'
+
+    def test_hashing_releases_connection(self, client, auth, monkeypatch):
+        """DB connection mustn't be held while waiting for the hashing pool"""
+        checked_out = []
+
+        async def hash_password(password):
+            checked_out.append(db.ENGINE.sync_engine.pool.checkedout())
+            return get_password_hash(password)
+
+        monkeypatch.setattr(auth_module, 'hash_password', hash_password)
+        p = {
+            "username": rand_str(16),
+            "password": rand_str(16),
+            "permissions": ""
+        }
+        r = client.request('POST', '/admin/users/user', json=p, headers=auth)
+        assert r.status_code == 200
+        r = client.request('PUT', '/admin/users/user', json={'password': rand_str(16)}, params={'id': r.json()['id']},
+                           headers=auth)
+        assert r.status_code == 200
+        assert checked_out == [0, 0]
+
     def test_delete_user(self, client, auth):  # pylint: disable=C0116
         permissions = "superuser"
         username = rand_str(16)
@@ -203,6 +286,11 @@ class TestUsersOperations:
         r = client.request('DELETE', '/admin/users/user', params=p, headers=auth)
         assert r.status_code == 404 and r.json()['detail'] == 'User not found'
 
+    def test_delete_myself(self, client, auth):  # pylint: disable=C0116
+        me_id = client.request('GET', '/admin/users/me', headers=auth).json()['id']
+        r = client.request('DELETE', '/admin/users/user', params={'id': me_id}, headers=auth)
+        assert r.status_code == 403
+
 
 @pytest.mark.usefixtures('client', 'rebuild_db', 'auth')
 class TestUserPermissions:
@@ -0,0 +1,54 @@
+"""
+Test database schema management
+"""
+import pytest
+from sqlalchemy import inspect, text
+
+from ..app import config, db
+
+from . import ENGINE, rand_str
+
+
+# pylint: disable=C0116
+
+@pytest.mark.usefixtures('client', 'rebuild_db')
+class TestSchemaUpgrade:
+    """
+    Test bringing existing tables up to date with models
+    """
+
+    def test_missing_indexes_created(self):
+        with ENGINE.begin() as conn:
+            conn.execute(text("DROP INDEX ix_signatures_product_id"))
+            conn.execute(text("DROP INDEX ix_installations_signature_id_fingerprint"))
+            db.upgrade_schema(conn)
+        inspector = inspect(ENGINE)
+        assert 'ix_signatures_product_id' in {i['name'] for i in inspector.get_indexes('signatures')}
+        installations_indexes = {i['name'] for i in inspector.get_indexes('installations')}
+        assert 'ix_installations_signature_id_fingerprint' in installations_indexes
+
+    def test_upgrade_is_idempotent(self):
+        indexes = {t.name: set(t.indexes) for t in db.SqlAlchemyBase.metadata.sorted_tables}
+        with ENGINE.begin() as conn:
+            db.upgrade_schema(conn)
+            db.upgrade_schema(conn)
+        # Models stay untouched
+        assert indexes == {t.name: set(t.indexes) for t in db.SqlAlchemyBase.metadata.sorted_tables}
+
+    def test_missing_unique_constraints_created(self, client, auth):
+        with ENGINE.begin() as conn:
+            conn.execute(text("ALTER TABLE products DROP CONSTRAINT products_name_key"))
+            conn.execute(text("ALTER TABLE users DROP CONSTRAINT users_username_key"))
+            db.upgrade_schema(conn)
+        name = rand_str(16)
+        r = client.request('POST', '/admin/product', json={"name": name}, headers=auth)
+        assert r.status_code == 200
+        r = client.request('POST', '/admin/product', json={"name": name}, headers=auth)
+        assert r.status_code == 400 and r.json() == {'detail': 'Product with specified name already exists'}
+        p = {
+            "username": config.DEFAULT_USER,
+            "password": rand_str(16),
+            "permissions": ""
+        }
+        r = client.request('POST', '/admin/users/user', json=p, headers=auth)
+        assert r.status_code == 409
@@ -8,6 +8,7 @@ from fastapi.testclient import TestClient
 
 from ..app import config
 from ..app.db import models
+from ..app.licensing import engine
 
 from . import rand_str, create_db_session
 
@@ -71,6 +72,20 @@ class TestKeySession:  # pylint: disable=C0115
         assert r.status_code == 200
         assert r.json()['success'] and r.json()['session_id']
 
+    def test_additional_content(self, client):
+        sig_content, product_content = rand_str(32), rand_str(32)
+        with create_db_session() as session:
+            p = models.Product(name=rand_str(16), additional_content=product_content)
+            session.add(p)
+            session.commit()
+            key = rand_str(32)
+            session.add(models.Signature(product_id=p.id, license_key=key, additional_content=sig_content))
+            session.commit()
+        r = client.request('POST', '/check_license', json={"license_key": key, "fingerprint": rand_str(16)})
+        assert r.status_code == 200
+        assert r.json()['additional_content_signature'] == sig_content
+        assert r.json()['additional_content_product'] == product_content
+
     def test_immediately_end_session(self, client):
         """Create session by verifying key and immediately end it"""
         session_id = self.__create_rand_session(client)
@@ -96,6 +111,23 @@ class TestKeySession:  # pylint: disable=C0115
         assert r.status_code == 200
         assert r.json()['success']
 
+    def test_keepalive_ended_session(self, client):
+        """Ended session mustn't be revived by keepalive"""
+        session_id = self.__create_rand_session(client)
+        p = {
+            "session_id": session_id
+        }
+        r = client.request('POST', '/end_session', json=p)
+        assert r.status_code == 200
+        r = client.request('POST', '/keepalive', json=p)
+        assert r.status_code == 404
+        r = client.request('POST', '/end_session', json=p)
+        assert r.status_code == 404
+
+    def test_keepalive_invalid_session_id(self, client):
+        r = client.request('POST', '/keepalive', json={"session_id": rand_str(16)})
+        assert r.status_code == 404
+
     def test_auto_end_session(self, client):
         """Create session and wait until it gets expired"""
         session_id = self.__create_rand_session(client)
@@ -182,3 +214,65 @@ class TestKeySession:  # pylint: disable=C0115
         time.sleep(sig_period + 2)
         r = client.request('POST', '/keepalive', json={"session_id": r.json()['session_id']})
         assert r.status_code == 404
+
+    def test_deleted_signature(self, client, auth):
+        """Test that cached license key info is forgotten when signature gets deleted"""
+        signature_id, key = self.__create_rand_signature()
+        self.__create_rand_session(client, key)
+        r = client.request('DELETE', '/admin/signature', params={"id": signature_id}, headers=auth)
+        assert r.status_code == 200
+        r = client.request('POST', '/check_license', json={"license_key": key, "fingerprint": rand_str(16)})
+        assert r.status_code == 403
+        assert r.json() == {'error': 'Invalid license key', 'success': False}
+
+    def test_updated_product(self, client, auth):
+        """Test that cached license key info is forgotten when product of signature gets updated"""
+        product_id = self.__create_rand_product()
+        key = self.__create_rand_signature(product_id)[1]
+        self.__create_rand_session(client, key)
+        r = client.request('PUT', '/admin/product', json={"sig_sessions_limit": 1}, params={"id": product_id},
+                           headers=auth)
+        assert r.status_code == 200
+        r = client.request('POST', '/check_license', json={"license_key": key, "fingerprint": rand_str(16)})
+        assert r.status_code == 403
+        assert r.json() == {'error': 'Sessions limit exceeded', 'success': False}
+
+    def test_updated_license_key(self, client, auth):
+        """Test that cached info of previous license key is forgotten when it gets changed"""
+        signature_id, key = self.__create_rand_signature()
+        self.__create_rand_session(client, key)
+        r = client.request('PUT', '/admin/signature', json={"license_key": rand_str(16)},
+                           params={"id": signature_id}, headers=auth)
+        assert r.status_code == 200
+        r = client.request('POST', '/check_license', json={"license_key": key, "fingerprint": rand_str(16)})
+        assert r.status_code == 403
+        assert r.json() == {'error': 'Invalid license key', 'success': False}
+
+    def test_stale_activation_date(self, client, monkeypatch):
+        """Activation date mustn't be reset when cached info is stale"""
+        sig_period = timedelta(seconds=5)
+        signature_id, key = self.__create_rand_signature(self.__create_rand_product(sig_period=sig_period))
+        p = {
+            "license_key": key,
+            "fingerprint": rand_str(16)
+        }
+
+        async def invalidate_license_info(*_):
+            pass
+
+        # Keep info cached before activation
+        with monkeypatch.context() as m:
+            m.setattr(engine, 'invalidate_license_info', invalidate_license_info)
+            r = client.request('POST', '/check_license', json=p)
+            assert r.status_code == 200
+        client.request('POST', '/end_session', json={"session_id": r.json()["session_id"]})
+        with create_db_session() as session:
+            s = session.get(models.Signature, signature_id)
+            s.activation_date -= sig_period * 2
+            session.commit()
+            activation_date = s.activation_date
+        r = client.request('POST', '/check_license', json=p)
+        assert r.status_code == 403
+        assert r.json() == {'error': 'License expired', 'success': False}
+        with create_db_session() as session:
+            assert session.get(models.Signature, signature_id).activation_date == activation_date
@@ -69,6 +69,53 @@ class TestProductsOperations:
         assert r.status_code == 200
         assert r.json()['items'] == len(r.json()['products']) == 1
 
+    def test_list_products_keyset_pagination(self, client, auth):
+        product_ids = sorted(_create_rand_product().id for _ in range(3))
+        r = client.request('GET', '/admin/list_products', params={"limit": 2}, headers=auth)
+        assert r.status_code == 200
+        assert [p['id'] for p in r.json()['products']] == product_ids[:2]
+        assert r.json()['next_cursor'] == product_ids[1]
+        p = {
+            "limit": 2,
+            "after_id": r.json()['next_cursor']
+        }
+        r = client.request('GET', '/admin/list_products', params=p, headers=auth)
+        assert r.status_code == 200
+        assert [p['id'] for p in r.json()['products']] == product_ids[2:]
+        assert r.json()['next_cursor'] is None
+        # No cursor when the last page is exactly full
+        r = client.request('GET', '/admin/list_products', params={"limit": 3}, headers=auth)
+        assert r.status_code == 200
+        assert [p['id'] for p in r.json()['products']] == product_ids
+        assert r.json()['next_cursor'] is None
+
+    def test_signatures_count(self, client, auth):
+        product_id = _create_rand_product().id
+        empty_product_id = _create_rand_product().id
+        for _ in range(3):
+            _create_rand_signature(product_id)
+        r = client.request('GET', '/admin/product', params={"id": product_id}, headers=auth)
+        assert r.status_code == 200 and r.json()['signatures'] == 3
+        r = client.request('GET', '/admin/list_products', headers=auth)
+        assert r.status_code == 200
+        counts = {p['id']: p['signatures'] for p in r.json()['products']}
+        assert counts[product_id] == 3 and counts[empty_product_id] == 0
+
+    def test_list_products_queries(self, client, auth, sql_statements):
+        """Listing products mustn't issue additional queries for every product"""
+        for _ in range(3):
+            _create_rand_signature(_create_rand_product().id)
+        r = client.request('GET', '/admin/list_products', headers=auth)
+        assert r.status_code == 200
+        assert len(sql_statements) == 2  # Authentication and products with quantity of signatures
+
+    def test_get_product_queries(self, client, auth, sql_statements):
+        product_id = _create_rand_product().id
+        _create_rand_signature(product_id)
+        r = client.request('GET', '/admin/product', params={"id": product_id}, headers=auth)
+        assert r.status_code == 200
+        assert len(sql_statements) == 2  # Authentication and product with permissions to get it
+
     def test_add_product_all_fields(self, client, auth):
         name = rand_str(16)
         i_limit = 2
@@ -91,6 +138,15 @@ class TestProductsOperations:
         assert j['sig_period'] == s_period
         assert j['additional_content'] == a_content
 
+    def test_add_product_queries(self, client, auth, sql_statements):
+        """Product must be inserted with its owner in a single transaction without additional reads"""
+        r = client.request('POST', '/admin/product', json={"name": rand_str(16)}, headers=auth)
+        assert r.status_code == 200
+        assert len(sql_statements) == 3  # Authentication, product and its owner
+        with create_db_session() as session:
+            p = session.query(models.Product).filter_by(id=r.json()['id']).one()
+            assert [u.username for u in p.owners] == [config.DEFAULT_USER]
+
     def test_add_product_autofill_fields(self, client, auth):
         name = rand_str(16)
         p = {
@@ -231,6 +287,19 @@ class TestProductsOperations:
         r = client.request('DELETE', '/admin/product', params=p, headers=auth)
         assert r.status_code == 200 and r.json() == {'success': True}
 
+    def test_delete_product_with_installations(self, client, auth):
+        product_id = _create_rand_product().id
+        signature_id = _create_rand_signature(product_id)
+        with create_db_session() as session:
+            session.add(models.Installation(fingerprint=rand_str(16), signature_id=signature_id))
+            session.commit()
+        r = client.request('DELETE', '/admin/product', params={"id": product_id}, headers=auth)
+        assert r.status_code == 200 and r.json() == {'success': True}
+        with create_db_session() as session:
+            assert session.query(models.Product).filter_by(id=product_id).one_or_none() is None
+            assert session.query(models.Signature).filter_by(product_id=product_id).count() == 0
+            assert session.query(models.Installation).filter_by(signature_id=signature_id).count() == 0
+
 
 class TestSignaturesOperations:
     """
@@ -260,6 +329,22 @@ class TestSignaturesOperations:
         assert r.json()['items'] == len(r.json()['signatures']) == 1
         assert r.json()['product_id'] == product_id
 
+    def test_list_signatures_after_id(self, client, auth, sql_statements):
+        product_id = _create_rand_product().id
+        sig_ids = sorted(_create_rand_signature(product_id) for _ in range(3))
+        p = {
+            "product_id": product_id,
+            "after_id": sig_ids[0]
+        }
+        r = client.request('GET', '/admin/list_signatures', params=p, headers=auth)
+        assert r.status_code == 200
+        assert [s['id'] for s in r.json()['signatures']] == sig_ids[1:]
+        assert len(sql_statements) == 2  # Authentication and signatures of available product
+
+    def test_list_signatures_product_not_exists(self, client, auth):
+        r = client.request('GET', '/admin/list_signatures', params={"product_id": 0}, headers=auth)
+        assert r.status_code == 404 and r.json() == {'detail': 'Product not found'}
+
     def test_add_signature_product_not_exists(self, client, auth):
         p = {
             "product_id": 0,
@@ -382,6 +467,17 @@ class TestSignaturesOperations:
         r = client.request('GET', '/admin/signature', params=p, headers=auth)
         assert r.status_code == 200 and r.json()['id'] == signature_id
 
+    def test_get_signature_queries(self, client, auth, sql_statements):
+        """Installations mustn't be loaded just to count them"""
+        signature_id = _create_rand_signature()
+        with create_db_session() as session:
+            for _ in range(3):
+                session.add(models.Installation(fingerprint=rand_str(16), signature_id=signature_id))
+            session.commit()
+        r = client.request('GET', '/admin/signature', params={"id": signature_id}, headers=auth)
+        assert r.status_code == 200 and r.json()['installed'] == 3
+        assert len(sql_statements) == 2  # Authentication and signature with quantity of installations
+
     def test_get_signature_not_exists(self, client, auth):
         p = {
             "id": 0